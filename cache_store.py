@@ -0,0 +1,72 @@
+"""
+cache_store.py
+==============
+跨 worker 共用的 JSON 快取
+
+設定 REDIS_URL 時存放於 Redis（SET key value EX ttl），gunicorn 多個 worker
+與重新部署後都能命中；未設定或 Redis 連線失敗時退回程序內的有界 TLRUCache
+（LOCAL_CACHE_MAXSIZE 筆，超過時淘汰最久未用者），避免長時間運行的 worker 記憶體無限成長。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+
+import orjson
+from cachetools import TLRUCache
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL: str = os.environ.get("REDIS_URL", "")
+LOCAL_CACHE_MAXSIZE: int = int(os.environ.get("LOCAL_CACHE_MAXSIZE", "10000"))
+
+# 可直接序列化 NumPy / pandas 數值（與 app.py 的 OrjsonProvider 一致）
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+_redis = None
+# 每筆各自帶 TTL（負向快取較短），故用 TLRUCache：value 為 (data, ttl)
+_local = TLRUCache(
+    maxsize=LOCAL_CACHE_MAXSIZE,
+    ttu=lambda _key, value, now: now + value[1],
+    timer=time.monotonic,
+)
+_local_lock = threading.Lock()
+
+
+def _get_redis():
+    global _redis
+    if _redis is None and REDIS_URL:
+        import redis
+        _redis = redis.Redis.from_url(REDIS_URL)
+        logger.info("Redis 快取連線建立完成")
+    return _redis
+
+
+def cache_get(key: str):
+    r = _get_redis()
+    if r is not None:
+        try:
+            value = r.get(key)
+            return orjson.loads(value) if value is not None else None
+        except Exception as exc:
+            logger.warning("Redis 讀取失敗，改用程序內快取：%s", exc)
+
+    with _local_lock:
+        entry = _local.get(key)
+    return entry[0] if entry is not None else None
+
+
+def cache_set(key: str, data, ttl: int):
+    r = _get_redis()
+    if r is not None:
+        try:
+            r.set(key, orjson.dumps(data, option=_ORJSON_OPTIONS), ex=ttl)
+            return
+        except Exception as exc:
+            logger.warning("Redis 寫入失敗，改用程序內快取：%s", exc)
+
+    with _local_lock:
+        _local[key] = (data, ttl)
@@ -0,0 +1,34 @@
+"""
+gunicorn.conf.py
+================
+正式環境啟動設定：
+
+    gunicorn -c gunicorn.conf.py app:app
+
+本服務幾乎都在等待外部 I/O（Google Trends / HF / Supabase / GNews），
+gevent worker 讓單一程序可同時處理大量慢請求，因此預設只開 1 個 worker。
+
+背景任務結果、快取、每 IP 限流與 pytrends token bucket 預設都存在程序內；
+多個 worker 會讓 /api/task 輪詢隨機 404，並使對 Google 的實際速率與每 IP
+上限各乘上 worker 數。因此只有設定 REDIS_URL 時才採用 WEB_CONCURRENCY
+（任務、快取與限流改存 Redis；token bucket 仍為每 worker 各一，速率須自行換算）。
+部分平台會自動注入 WEB_CONCURRENCY，未設 REDIS_URL 時一律忽略而非啟動失敗。
+"""
+
+import logging
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+workers = 1
+if os.environ.get("REDIS_URL"):
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+elif int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+    logging.getLogger("gunicorn.error").warning(
+        "未設定 REDIS_URL，忽略 WEB_CONCURRENCY，僅啟動 1 個 worker"
+    )
+worker_class = "gevent"
+worker_connections = 1000
+timeout = 60
+
+# app.py 依此決定是否執行 gevent monkey patch
+raw_env = ["GEVENT=1"]
@@ -9,19 +9,29 @@ Hugging Face Inference API 整合模組
   3. semantic_keyword_search()   — 語意關鍵字搜尋（句子嵌入）
   4. summarize_trends()          — AI 趨勢洞察摘要（LLM）
 
-所有結果快取於記憶體（TTL 1 小時），API 錯誤時優雅降級。
+所有結果快取 1 小時（設定 REDIS_URL 時跨 worker 共用），API 錯誤時優雅降級。
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import os
-import time
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Callable, Optional
 
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache_store import cache_get, cache_set
+from keyword_discovery import KEYWORD_SERVICE_MAP
 
 logger = logging.getLogger(__name__)
 
@@ -38,45 +48,79 @@ MODELS = {
 }
 
 CACHE_TTL_SECONDS = 3600   # 1 小時
-_cache: dict[str, dict] = {}   # key → { "data": ..., "expires_at": float }
+NEGATIVE_CACHE_TTL_SECONDS = 300   # 空結果（HF 失敗 / 無資料）只快取 5 分鐘
 
 
 # ─────────────────────────────────────────────────────────────
 # 快取工具
 # ─────────────────────────────────────────────────────────────
 
+def _key(*parts: str) -> str:
+    """將任意長度的輸入雜湊成固定長度的快取 key（各段以 \x1f 分隔，避免拼接碰撞）。"""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        h.update(p.encode())
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
 def _cache_get(key: str):
-    entry = _cache.get(key)
-    if entry and time.time() < entry["expires_at"]:
-        return entry["data"]
-    return None
+    return cache_get(key)
 
 
-def _cache_set(key: str, data):
-    _cache[key] = {"data": data, "expires_at": time.time() + CACHE_TTL_SECONDS}
+def _cache_set(key: str, data, ttl: Optional[int] = None):
+    if ttl is None:
+        ttl = CACHE_TTL_SECONDS if data else NEGATIVE_CACHE_TTL_SECONDS
+    cache_set(key, data, ttl)
+
+
+# ─────────────────────────────────────────────────────────────
+# 並行執行（HF 呼叫皆為 I/O 等待，requests 等待期間會釋放 GIL）
+# ─────────────────────────────────────────────────────────────
+HF_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hf")
+
+
+def hf_parallel(jobs: list[Callable]) -> list:
+    """同時執行多個無參數 callable，依原順序回傳結果；總延遲 ≈ 最慢的一個。"""
+    return list(HF_EXECUTOR.map(lambda job: job(), jobs))
 
 
 # ─────────────────────────────────────────────────────────────
 # HF API 通用請求
 # ─────────────────────────────────────────────────────────────
 
+# 共用 Session：keep-alive 重用 TLS 連線；429 / 5xx（含模型冷啟動 503）
+# 由 urllib3 以指數退避自動重試，並遵守 Retry-After；
+# 讀取逾時不重試（read=False）：POST 非冪等，重送會讓同一次生成重複計費
+# 連線池需容納 gevent worker 下同時進行的 HF 請求，否則多出的連線用完即丟
+HF_POOL_SIZE = int(os.environ.get("HF_POOL_SIZE", 50))
+
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=HF_POOL_SIZE,
+    pool_maxsize=HF_POOL_SIZE,
+    max_retries=Retry(
+        total=3,
+        read=False,
+        backoff_factor=1,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+))
+_SESSION.headers.update({"Authorization": f"Bearer {HF_TOKEN}", "Accept-Encoding": "gzip"})
+
+
 def _hf_post(model_id: str, payload: dict, timeout: int = 30) -> Optional[dict | list]:
     """向 HF Inference API 發送 POST 請求（用於 pipeline 任務）。"""
     url = f"{HF_API_BASE}/{model_id}"
-    headers = {"Authorization": f"Bearer {HF_TOKEN}", "Content-Type": "application/json"}
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        resp = _SESSION.post(url, json=payload, timeout=timeout)
         if resp.status_code == 200:
-            return resp.json()
-        elif resp.status_code == 503:
-            # 模型冷啟動，等待重試
-            logger.warning("HF model %s loading, waiting 15s…", model_id)
-            time.sleep(15)
-            resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
-            return resp.json() if resp.status_code == 200 else None
-        else:
-            logger.warning("HF API %s error %s: %s", model_id, resp.status_code, resp.text[:200])
-            return None
+            return orjson.loads(resp.content)
+        logger.warning("HF API %s error %s: %s", model_id, resp.status_code, resp.text[:200])
+        return None
     except Exception as exc:
         logger.error("HF API request failed: %s", exc)
         return None
@@ -88,7 +132,6 @@ def _hf_chat(system_prompt: str, user_prompt: str, max_tokens: int = 200, timeou
     正確 URL: https://router.huggingface.co/v1/chat/completions
     """
     url = "https://router.huggingface.co/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {HF_TOKEN}", "Content-Type": "application/json"}
     payload = {
         "model": "Qwen/Qwen2.5-72B-Instruct",
         "messages": [
@@ -99,9 +142,9 @@ def _hf_chat(system_prompt: str, user_prompt: str, max_tokens: int = 200, timeou
         "temperature": 0.4,
     }
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        resp = _SESSION.post(url, json=payload, timeout=timeout)
         if resp.status_code == 200:
-            data = resp.json()
+            data = orjson.loads(resp.content)
             return data["choices"][0]["message"]["content"].strip()
         else:
             logger.warning("_hf_chat error %s: %s", resp.status_code, resp.text[:200])
@@ -114,15 +157,23 @@ def _hf_chat(system_prompt: str, user_prompt: str, max_tokens: int = 200, timeou
 # 1. 動態服務/商品推測 (LLM)
 # ─────────────────────────────────────────────────────────────
 
-def suggest_services_ai(keyword: str, scenario: str = "") -> list[str]:
+# LLM 回覆中第一個（不含巢狀的）JSON 陣列
+_ARRAY_RE = re.compile(r"\[[^\[\]]{0,500}\]", re.S)
+
+def suggest_services_ai(keyword: str, scenario: str = "") -> tuple[list[str], str]:
     """
     利用 LLM 為關鍵字生成 3 個對應的服務或商品名稱（繁體中文）。
-    Returns: list[str] — 最多 3 個服務/商品名稱；失敗時回傳空 list
+    關鍵字已在人工策展的 KEYWORD_SERVICE_MAP 中時直接回傳，不呼叫 LLM。
+    Returns: (services, source) — services 最多 3 個服務/商品名稱，失敗時為空 list；
+             source 為 "curated"（取自 KEYWORD_SERVICE_MAP）或 "ai"
     """
-    cache_key = f"suggest:{keyword}:{scenario}"
+    if keyword in KEYWORD_SERVICE_MAP:
+        return list(KEYWORD_SERVICE_MAP[keyword][:3]), "curated"
+
+    cache_key = "suggest:" + _key(keyword, scenario)
     cached = _cache_get(cache_key)
     if cached is not None:
-        return cached
+        return cached, "ai"
 
     scenario_hint = f"（場景：{scenario}）" if scenario else ""
     system = "你是台灣市場行銷專家，請用繁體中文回答。"
@@ -135,17 +186,16 @@ def suggest_services_ai(keyword: str, scenario: str = "") -> list[str]:
     text = _hf_chat(system, user, max_tokens=80, timeout=35)
     services: list[str] = []
     try:
-        if text:
-            start = text.find("[")
-            end   = text.rfind("]") + 1
-            if start != -1 and end > start:
-                services = json.loads(text[start:end])
-                services = [str(s).strip() for s in services if s][:3]
+        m = _ARRAY_RE.search(text) if text else None
+        if m:
+            services = orjson.loads(m.group())
+            services = [str(s).strip() for s in services if s][:3]
     except Exception as exc:
         logger.warning("suggest_services_ai parse error: %s", exc)
 
-    _cache_set(cache_key, services)
-    return services
+    # 模型有回應但解析不出結果時重問多半一樣，沿用完整 TTL；HF 呼叫失敗才用短 TTL
+    _cache_set(cache_key, services, None if not text else CACHE_TTL_SECONDS)
+    return services, "ai"
 
 
 # ─────────────────────────────────────────────────────────────
@@ -158,6 +208,10 @@ SCENARIO_LABELS_ZH = {
     "牙科": "dental care and orthodontics",
     "保健品": "dietary supplements and nutrition",
 }
+# 分類熱路徑只需查表：候選標籤與反查表於載入時建好
+_CANDIDATE_LABELS = list(SCENARIO_LABELS_ZH.values())
+_EN_TO_ZH = {v: k for k, v in SCENARIO_LABELS_ZH.items()}
+_ZEROSHOT_PARAMETERS = {"candidate_labels": _CANDIDATE_LABELS}
 
 
 def classify_keyword_scenario(keyword: str) -> dict:
@@ -167,18 +221,14 @@ def classify_keyword_scenario(keyword: str) -> dict:
     Returns:
         {"scenario": "牙科", "confidence": 0.93, "all_scores": {...}}
     """
-    cache_key = f"classify:{keyword}"
+    cache_key = "classify:" + _key(keyword)
     cached = _cache_get(cache_key)
     if cached is not None:
         return cached
 
-    candidate_labels = list(SCENARIO_LABELS_ZH.values())
     result = _hf_post(
         MODELS["zeroshot"],
-        {
-            "inputs": keyword,
-            "parameters": {"candidate_labels": candidate_labels},
-        },
+        {"inputs": keyword, "parameters": _ZEROSHOT_PARAMETERS},
         timeout=20,
     )
 
@@ -186,19 +236,18 @@ def classify_keyword_scenario(keyword: str) -> dict:
     try:
         # 新版 router 回傳格式： [{"label": ..., "score": ...}, ...]
         if result and isinstance(result, list) and len(result) > 0:
-            en_to_zh = {v: k for k, v in SCENARIO_LABELS_ZH.items()}
             # 第一層可能是嵌套 list（[[...]])或就是 [...])
             items = result[0] if isinstance(result[0], list) else result
             if items and isinstance(items[0], dict) and "label" in items[0]:
                 # 排庋（router 已排，但保险）
                 items_sorted = sorted(items, key=lambda x: x.get("score", 0), reverse=True)
                 all_scores = {
-                    en_to_zh.get(item["label"], item["label"]): round(item.get("score", 0), 4)
+                    _EN_TO_ZH.get(item["label"], item["label"]): round(item.get("score", 0), 4)
                     for item in items_sorted
                 }
                 top_label = items_sorted[0]["label"]
                 output = {
-                    "scenario": en_to_zh.get(top_label, top_label),
+                    "scenario": _EN_TO_ZH.get(top_label, top_label),
                     "confidence": round(items_sorted[0].get("score", 0), 4),
                     "all_scores": all_scores,
                 }
@@ -213,33 +262,32 @@ def classify_keyword_scenario(keyword: str) -> dict:
 # 3. 語意關鍵字搜尋 (Sentence Embeddings)
 # ─────────────────────────────────────────────────────────────
 
-import math
+# 單次嵌入請求最多幾句，超過則分批並行送出
+EMBED_BATCH_SIZE = 32
 
 
-def _cosine_similarity(a: list[float], b: list[float]) -> float:
-    dot = sum(x * y for x, y in zip(a, b))
-    norm_a = math.sqrt(sum(x * x for x in a))
-    norm_b = math.sqrt(sum(y * y for y in b))
-    return dot / (norm_a * norm_b + 1e-9)
+def _get_embedding(texts: list[str]) -> Optional[list[list[float]]]:
+    """取得句子嵌入向量；超過 EMBED_BATCH_SIZE 句時分批並行請求，任一批失敗回傳 None。"""
+    if len(texts) <= EMBED_BATCH_SIZE:
+        return _get_embedding_batch(texts)
 
+    batches = [texts[i: i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    results = hf_parallel([lambda b=b: _get_embedding_batch(b) for b in batches])
+    if any(not r or len(r) != len(b) for r, b in zip(results, batches)):
+        return None
+    return [vec for r in results for vec in r]
 
-def _get_embedding(texts: list[str]) -> Optional[list[list[float]]]:
+
+def _get_embedding_batch(texts: list[str]) -> Optional[list[list[float]]]:
     """取得句子嵌入向量（router 版需要 /pipeline/feature-extraction 後綴）。"""
     model_id = MODELS["embedding"]
     url = f"{HF_API_BASE}/{model_id}/pipeline/feature-extraction"
-    headers = {"Authorization": f"Bearer {HF_TOKEN}", "Content-Type": "application/json"}
     try:
-        resp = requests.post(url, headers=headers, json={"inputs": texts}, timeout=20)
+        resp = _SESSION.post(url, json={"inputs": texts}, timeout=20)
         if resp.status_code == 200:
-            result = resp.json()
+            result = orjson.loads(resp.content)
             if isinstance(result, list) and len(result) > 0:
                 return result
-        elif resp.status_code == 503:
-            logger.warning("HF embedding model loading, waiting 10s…")
-            time.sleep(10)
-            resp = requests.post(url, headers=headers, json={"inputs": texts}, timeout=20)
-            if resp.status_code == 200:
-                return resp.json()
         else:
             logger.warning("HF embedding error %s: %s", resp.status_code, resp.text[:200])
     except Exception as exc:
@@ -247,6 +295,64 @@ def _get_embedding(texts: list[str]) -> Optional[list[list[float]]]:
     return None
 
 
+# 候選詞（種子關鍵字）幾乎不變：嵌入一次後常駐記憶體，並存檔供下次啟動直接載入
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "seed_embeddings.npz"),
+)
+_seed_embeddings: dict[str, np.ndarray] = {}
+_seed_embeddings_lock = threading.Lock()
+
+
+def _load_seed_embeddings() -> None:
+    """載入先前存檔的候選詞嵌入（模型不同則忽略）。"""
+    if not os.path.exists(EMBEDDING_CACHE_PATH):
+        return
+    try:
+        with np.load(EMBEDDING_CACHE_PATH) as f:
+            if str(f["model"]) != MODELS["embedding"]:
+                return
+            _seed_embeddings.update(zip(f["texts"].tolist(), f["vectors"]))
+        logger.info("載入 %d 筆候選詞嵌入：%s", len(_seed_embeddings), EMBEDDING_CACHE_PATH)
+    except Exception as exc:
+        logger.warning("候選詞嵌入檔讀取失敗（將重新計算）：%s", exc)
+
+
+def _save_seed_embeddings() -> None:
+    try:
+        os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH), exist_ok=True)
+        tmp_path = EMBEDDING_CACHE_PATH + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                model=np.array(MODELS["embedding"]),
+                texts=np.array(list(_seed_embeddings)),
+                vectors=np.stack(list(_seed_embeddings.values())),
+            )
+        os.replace(tmp_path, EMBEDDING_CACHE_PATH)
+    except Exception as exc:
+        logger.warning("候選詞嵌入檔寫入失敗（不影響主功能）：%s", exc)
+
+
+def _get_seed_embeddings(candidates: list[str]) -> Optional[np.ndarray]:
+    """
+    回傳 candidates 的嵌入矩陣（len(candidates) × dim）。
+    只有尚未嵌入過的候選詞才送 HF（一次批次），失敗時回傳 None。
+    """
+    missing = [c for c in dict.fromkeys(candidates) if c not in _seed_embeddings]
+    if missing:
+        vectors = _get_embedding(missing)
+        if not vectors or len(vectors) != len(missing):
+            return None
+        with _seed_embeddings_lock:
+            _seed_embeddings.update(zip(missing, np.asarray(vectors, dtype=np.float32)))
+            _save_seed_embeddings()
+    return np.stack([_seed_embeddings[c] for c in candidates])
+
+
+_load_seed_embeddings()
+
+
 def semantic_keyword_search(query: str, candidates: list[str], top_k: int = 5) -> list[dict]:
     """
     對 query 計算與 candidates 的語意相似度，回傳最相近的 top_k 筆。
@@ -254,23 +360,25 @@ def semantic_keyword_search(query: str, candidates: list[str], top_k: int = 5) -
     Returns:
         [{"keyword": "隱適美", "score": 0.87}, ...]  按 score 降序排列
     """
-    cache_key = f"semantic:{query}:{','.join(candidates[:10])}:{top_k}"
+    cache_key = "semantic:" + _key(query, *candidates, str(top_k))
     cached = _cache_get(cache_key)
     if cached is not None:
         return cached
 
-    all_texts = [query] + candidates
-    embeddings = _get_embedding(all_texts)
+    # 每次請求只需嵌入 query，候選詞向量取自常駐快取
+    query_emb = _get_embedding([query])
+    C = _get_seed_embeddings(candidates) if query_emb and candidates else None
 
     results: list[dict] = []
-    if embeddings and len(embeddings) > 1:
-        query_vec = embeddings[0]
-        for i, cand in enumerate(candidates):
-            if i + 1 < len(embeddings):
-                score = _cosine_similarity(query_vec, embeddings[i + 1])
-                results.append({"keyword": cand, "score": round(score, 4)})
-        results.sort(key=lambda x: x["score"], reverse=True)
-        results = results[:top_k]
+    if C is not None:
+        q = np.asarray(query_emb[0], dtype=np.float32)
+        # 一次算出所有候選詞的 cosine similarity
+        scores = C @ q / (np.linalg.norm(C, axis=1) * np.linalg.norm(q) + 1e-9)
+        # 只排序前 top_k 名
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        results = [{"keyword": candidates[i], "score": round(float(scores[i]), 4)} for i in top]
 
     _cache_set(cache_key, results)
     return results
@@ -280,12 +388,17 @@ def semantic_keyword_search(query: str, candidates: list[str], top_k: int = 5) -
 # 4. AI 趨勢洞察摘要 (LLM)
 # ─────────────────────────────────────────────────────────────
 
+# 截斷到自然結尾：依序找最後一個「。\n」、「。」、「\n\n」，且前面至少 21 字
+_SUMMARY_END_RES = tuple(
+    re.compile(rf"(?s).{{21,}}{mark}") for mark in ("。\n", "。", "\n\n")
+)
+
 def summarize_trends(keywords: list[str], iot_data: dict, geo: str = "TW") -> str:
     """
     根據 Interest Over Time 資料生成繁體中文趨勢洞察摘要。
     Returns: str — 2-3 句的中文趨勢洞察，失敗時回傳空字串
     """
-    cache_key = f"summary:{','.join(keywords)}:{geo}"
+    cache_key = "summary:" + _key(*keywords, geo)
     cached = _cache_get(cache_key)
     if cached is not None:
         return cached
@@ -315,10 +428,10 @@ def summarize_trends(keywords: list[str], iot_data: dict, geo: str = "TW") -> st
 
     # 截斷到自然結尾
     if summary:
-        for end_mark in ["。\n", "。", "\n\n"]:
-            idx = summary.rfind(end_mark)
-            if idx > 20:
-                summary = summary[:idx + len(end_mark)].strip()
+        for end_re in _SUMMARY_END_RES:
+            m = end_re.match(summary)
+            if m:
+                summary = m.group().strip()
                 break
 
     _cache_set(cache_key, summary)
@@ -342,7 +455,7 @@ def score_commercial_intent(keyword: str, scenario: str = "") -> dict:
           "keyword_type": "...",  # 交易型/資訊型/導航型
         }
     """
-    cache_key = f"intent:{keyword}:{scenario}"
+    cache_key = "intent:" + _key(keyword, scenario)
     cached = _cache_get(cache_key)
     if cached is not None:
         return cached
@@ -410,7 +523,7 @@ def analyze_platform_attribution(keyword: str, scenario: str = "") -> dict:
           ]
         }
     """
-    cache_key = f"platform:{keyword}:{scenario}"
+    cache_key = "platform:" + _key(keyword, scenario)
     cached = _cache_get(cache_key)
     if cached is not None:
         return cached
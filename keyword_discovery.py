@@ -35,22 +35,36 @@ Supabase 建表 SQL（第一次使用前請在 Supabase SQL Editor 執行）：
 
 from __future__ import annotations
 
+import functools
+import itertools
 import logging
+import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, Optional, Sequence
 
-import pandas as pd
-from pytrends.request import TrendReq
-from pytrends.exceptions import TooManyRequestsError
-from supabase import create_client, Client
+import ahocorasick
+import orjson
+
+from rate_limiter import pytrends_bucket, retry_after_seconds
+
+# pandas / pytrends / supabase 於實際用到時才載入：只讀 KEYWORD_SERVICE_MAP 等常數的
+# 模組（如 hf_services）不必付出這些套件的匯入成本
+if TYPE_CHECKING:
+    import pandas as pd
+    from pytrends.request import TrendReq
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────
 # 場景種子關鍵字（可自行編輯或擴充場景）
 # ─────────────────────────────────────────────────────────────
-SCENARIO_SEEDS: dict[str, list[str]] = {
+SCENARIO_SEEDS: Mapping[str, list[str]] = MappingProxyType({
     "旅遊": [
         "旅遊",
         "機票",
@@ -99,14 +113,19 @@ SCENARIO_SEEDS: dict[str, list[str]] = {
         "營養補充",
         "抗氧化",
     ],
-}
+})
 
 # 快取有效期（天）
 CACHE_TTL_DAYS = 7
+# 程序內 L1 快取有效期（秒），省去重複查詢 Supabase 的往返
+L1_TTL_SECONDS = 600
 
-# pytrends 限速等待（秒）
-RATE_LIMIT_SLEEP = 60
+# pytrends 429 重試：指數退避 BACKOFF_BASE * 2^(n-1)，上限 BACKOFF_CAP，再乘 0.5–1.5 jitter
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_CAP_SECONDS = 300
 MAX_RETRIES = 3
+# 等待共用 token bucket 的上限（秒）；離線批次可等較久
+BUCKET_TIMEOUT_SECONDS = 120
 
 # Google Trends 分析時間窗（發現高聲量關鍵字用）
 DISCOVERY_TIMEFRAME = "today 1-m"   # 近 4 週
@@ -114,11 +133,14 @@ DISCOVERY_TIMEFRAME = "today 1-m"   # 近 4 週
 # 每次 build_payload 最多可放幾個關鍵字（Google Trends 上限 5）
 CHUNK_SIZE = 5
 
+# 同時送出的批次數；實際速率仍由共用的 pytrends_bucket 控制
+DISCOVERY_WORKERS = 3
+
 # ─────────────────────────────────────────────────────────────
 # 關鍵字 → 服務 / 商品映射（確定性高，人工策展）
 # list 中第一個為主要服務，其後為延伸推薦
 # ─────────────────────────────────────────────────────────────
-KEYWORD_SERVICE_MAP: dict[str, list[str]] = {
+KEYWORD_SERVICE_MAP: Mapping[str, list[str]] = MappingProxyType({
     # ── 旅遊 ──────────────────────────────────────────────────
     "旅遊":     ["旅遊套裝行程", "旅遊保險", "旅遊信用卡"],
     "機票":     ["機票比價平台", "廉價航空票券", "商務艙升等"],
@@ -181,7 +203,7 @@ KEYWORD_SERVICE_MAP: dict[str, list[str]] = {
     "抗氧化":   ["抗氧化保健品（Q10）", "白藜蘆醇", "維他命 C 高劑量"],
     "蛋白質":   ["乳清蛋白", "植物性蛋白粉", "高蛋白飲食計畫"],
     "薑黃":     ["薑黃膠囊", "薑黃拿鐵", "消炎抗氧化組合"],
-}
+})
 
 # 場景層級備用（關鍵字不在 KEYWORD_SERVICE_MAP 時使用）
 SCENARIO_SERVICE_FALLBACK: dict[str, list[str]] = {
@@ -192,84 +214,168 @@ SCENARIO_SERVICE_FALLBACK: dict[str, list[str]] = {
 }
 
 
-def get_keyword_services(keyword: str, scenario: str = "") -> list[str]:
+# 上面兩張表為唯讀；熱路徑用的衍生結構於載入時算好一次
+_SCENARIO_LIST: tuple[str, ...] = tuple(SCENARIO_SEEDS)
+
+# 各場景種子依 CHUNK_SIZE 切好的批次（Google Trends 每次最多 5 個關鍵字）
+_SCENARIO_CHUNKS: dict[str, tuple[tuple[str, ...], ...]] = {
+    scenario: tuple(
+        tuple(seeds[i: i + CHUNK_SIZE]) for i in range(0, len(seeds), CHUNK_SIZE)
+    )
+    for scenario, seeds in SCENARIO_SEEDS.items()
+}
+
+# 模糊匹配索引；值為 key 在 _KSM_ITEMS 中的順序，
+# 多個 key 同時命中時取最前者，與逐一比對的結果相同
+_KSM_ITEMS: tuple[tuple[str, list[str]], ...] = tuple(KEYWORD_SERVICE_MAP.items())
+
+# 「已知詞包含於關鍵字」：Aho-Corasick 一次掃描關鍵字找出所有出現的已知詞
+_KSM_AUTOMATON = ahocorasick.Automaton()
+for _idx, (_key, _) in enumerate(_KSM_ITEMS):
+    _KSM_AUTOMATON.add_word(_key, _idx)
+_KSM_AUTOMATON.make_automaton()
+
+# 「關鍵字包含於已知詞」：已知詞的所有子字串 → 最前面的順序
+_KSM_SUBSTRINGS: dict[str, int] = {}
+for _idx, (_key, _) in enumerate(_KSM_ITEMS):
+    for _i in range(len(_key) + 1):
+        for _j in range(_i, len(_key) + 1):
+            _KSM_SUBSTRINGS.setdefault(_key[_i:_j], _idx)
+
+
+@functools.lru_cache(maxsize=4096)
+def get_keyword_services(keyword: str, scenario: str = "") -> tuple[str, ...]:
     """
     回傳該關鍵字對應的服務/商品推測。
     優先精確匹配，其次模糊匹配（包含關係），最後用場景備用。
+    結果依 (keyword, scenario) 記憶；回傳 tuple 以免呼叫端改到快取內容。
     """
     # 1. 精確匹配
     if keyword in KEYWORD_SERVICE_MAP:
-        return KEYWORD_SERVICE_MAP[keyword]
+        return tuple(KEYWORD_SERVICE_MAP[keyword])
 
     # 2. 模糊匹配（關鍵字包含已知詞 or 已知詞包含關鍵字）
-    for key, svcs in KEYWORD_SERVICE_MAP.items():
-        if key in keyword or keyword in key:
-            return svcs
+    best = _KSM_SUBSTRINGS.get(keyword, len(_KSM_ITEMS))
+    for _end, idx in _KSM_AUTOMATON.iter(keyword):
+        best = min(best, idx)
+    if best < len(_KSM_ITEMS):
+        return tuple(_KSM_ITEMS[best][1])
 
     # 3. 場景備用
     if scenario and scenario in SCENARIO_SERVICE_FALLBACK:
-        return SCENARIO_SERVICE_FALLBACK[scenario]
+        return tuple(SCENARIO_SERVICE_FALLBACK[scenario])
 
-    return []
+    return ()
 
 
 
 # ─────────────────────────────────────────────────────────────
 # Supabase 連線（lazy singleton）
 # ─────────────────────────────────────────────────────────────
-SUPABASE_URL = "https://shiqrelmuvzwcxqndnyq.supabase.co"
-SUPABASE_KEY = (
-    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"
-    ".eyJpc3MiOiJzdXBhYmFzZSIsInJlZiI6InNoaXFyZWxt"
-    "dXZ6d2N4cW5kbnlxIiwicm9sZSI6InNlcnZpY2Vfcm9sZ"
-    "SIsImlhdCI6MTczODMwNjk0MiwiZXhwIjoyMDUzODgyOTQyfQ"
-    ".xiA87hhy0tOTytDmSmy_pRqeqVSLtEBqsrTxrvLy0ec"
-)
-
+# 連線資訊於第一次連線時取自環境變數（SUPABASE_URL / SUPABASE_KEY），金鑰不放在原始碼中
 _sb_client: Optional[Client] = None
 
 
 def _get_supabase() -> Client:
     global _sb_client
     if _sb_client is None:
-        _sb_client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        logger.info("Supabase 連線建立（keyword_discovery）")
+        url = os.environ.get("SUPABASE_URL", "https://shiqrelmuvzwcxqndnyq.supabase.co")
+        key = os.environ.get("SUPABASE_KEY", "")
+        if not key:
+            raise RuntimeError("未設定 SUPABASE_KEY 環境變數")
+        from supabase import create_client
+        _sb_client = create_client(url, key)
+        logger.info("Supabase 連線建立（keyword_discovery）：%s", url)
     return _sb_client
 
 
 # ─────────────────────────────────────────────────────────────
-# pytrends 連線（lazy singleton）
+# pytrends 連線（每個執行緒各一個，lazy）
+# TrendReq 的 build_payload 會改寫自身狀態，不能跨執行緒共用
 # ─────────────────────────────────────────────────────────────
-_pt_client: Optional[TrendReq] = None
+class _PytrendsSlot:
+    """
+    一個 TrendReq 與其目前載入的 payload（(關鍵字 tuple, geo)，未載入為 None）。
+    Step 1 載入的 payload 若恰為 top 關鍵字，Step 2 持 lock 確認後直接沿用，
+    省去再一次 build_payload（token 請求）。
+    """
 
+    __slots__ = ("pt", "lock", "payload")
 
-def _get_pytrends() -> TrendReq:
-    global _pt_client
-    if _pt_client is None:
-        _pt_client = TrendReq(
+    def __init__(self):
+        from pytrends.request import TrendReq
+        self.pt = TrendReq(
             hl="zh-TW",
             tz=-480,
             timeout=(10, 30),
-            retries=2,
-            backoff_factor=1.5,
+            # 不用 pytrends 內建重試：429 須交給 _safe_call 退避並回饋 token bucket
+            retries=0,
+            backoff_factor=0,
         )
+        self.lock = threading.Lock()
+        self.payload: Optional[tuple[tuple[str, ...], str]] = None
+
+    def load(self, kw_list: Sequence[str], geo: str) -> TrendReq:
+        """build_payload 並記錄；呼叫端須持有 self.lock。"""
+        self.payload = None
+        _safe_call(self.pt.build_payload, kw_list=list(kw_list), timeframe=DISCOVERY_TIMEFRAME, geo=geo)
+        self.payload = (tuple(kw_list), geo)
+        return self.pt
+
+
+_pt_local = threading.local()
+_batch_executor = ThreadPoolExecutor(
+    max_workers=DISCOVERY_WORKERS, thread_name_prefix="discovery"
+)
+
+
+def _get_pytrends() -> _PytrendsSlot:
+    slot = getattr(_pt_local, "slot", None)
+    if slot is None:
+        slot = _pt_local.slot = _PytrendsSlot()
         logger.info("TrendReq 初始化完成（keyword_discovery）")
-    return _pt_client
+    return slot
 
 
-def _safe_call(fn, *args, **kwargs):
-    """呼叫 pytrends API，遇到 429 限速則等待後重試。"""
+def _map_batches(fn, chunks: Sequence):
+    """
+    依序回傳 fn(idx, chunk) 的結果。即使只有一批也交給 _batch_executor：
+    TrendReq 只在固定的 worker 執行緒上建立與重用（建立時會抓 Google cookie，
+    且不經 token bucket），不能在每個請求執行緒各建一個。
+    """
+    return _batch_executor.map(fn, range(len(chunks)), chunks)
+
+
+def _safe_call(fn, *args, cost: int = 1, **kwargs):
+    """
+    經共用 token bucket 呼叫 pytrends API，遇到 429 限速則依 Retry-After
+    （若有）或指數退避 + jitter 等待後重試。
+    cost 為此呼叫實際送出的 Google 請求數（related_queries 每個關鍵字一次）。
+    """
+    from pytrends.exceptions import TooManyRequestsError
+
     for attempt in range(1, MAX_RETRIES + 1):
+        pytrends_bucket.acquire(timeout=BUCKET_TIMEOUT_SECONDS, tokens=cost)
         try:
-            return fn(*args, **kwargs)
-        except TooManyRequestsError:
-            if attempt == MAX_RETRIES:
+            result = fn(*args, **kwargs)
+        except TooManyRequestsError as exc:
+            pytrends_bucket.decrease_rate()
+            retry_after = retry_after_seconds(exc)
+            # Retry-After 超過退避上限視同本批失敗，不讓背景工作卡住
+            if attempt == MAX_RETRIES or (retry_after or 0) > BACKOFF_CAP_SECONDS:
                 raise
+            delay = retry_after or (
+                min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+                * random.uniform(0.5, 1.5)
+            )
             logger.warning(
-                "Google 限速 (429)，第 %d/%d 次重試，等待 %ds …",
-                attempt, MAX_RETRIES, RATE_LIMIT_SLEEP,
+                "Google 限速 (429)，第 %d/%d 次重試，等待 %.1fs …",
+                attempt, MAX_RETRIES, delay,
             )
-            time.sleep(RATE_LIMIT_SLEEP)
+            time.sleep(delay)
+        else:
+            pytrends_bucket.increase_rate()
+            return result
 
 
 # ─────────────────────────────────────────────────────────────
@@ -288,48 +394,55 @@ def discover_top_keywords(
     Returns:
         [{"keyword": "旅遊", "avg_score": 82.3}, ...]  已按 avg_score 降序排列
     """
-    seeds = SCENARIO_SEEDS.get(scenario)
-    if not seeds:
-        raise ValueError(f"未知場景：'{scenario}'，可用場景：{list(SCENARIO_SEEDS.keys())}")
-
-    pt = _get_pytrends()
-    scores: dict[str, float] = {}
+    return _discover_top_keywords(scenario, geo, top_n)[0]
 
-    # 每批最多 CHUNK_SIZE 個（Google Trends 限制）
-    chunks = [seeds[i: i + CHUNK_SIZE] for i in range(0, len(seeds), CHUNK_SIZE)]
 
-    for idx, chunk in enumerate(chunks):
+def _discover_top_keywords(
+    scenario: str,
+    geo: str,
+    top_n: int,
+) -> tuple[list[dict], Optional[_PytrendsSlot]]:
+    """同 discover_top_keywords；另回傳 payload 恰為 top 關鍵字的 slot（若有）。"""
+    chunks = _SCENARIO_CHUNKS.get(scenario)
+    if not chunks:
+        raise ValueError(f"未知場景：'{scenario}'，可用場景：{list(_SCENARIO_LIST)}")
+
+    def run_batch(idx: int, chunk: tuple[str, ...]) -> tuple[dict[str, float], Optional[_PytrendsSlot]]:
         logger.info("  [%s] 批次 %d/%d，關鍵字：%s", scenario, idx + 1, len(chunks), chunk)
+        slot = _get_pytrends()
         try:
-            pt.build_payload(kw_list=chunk, timeframe=DISCOVERY_TIMEFRAME, geo=geo)
-            df: pd.DataFrame = _safe_call(pt.interest_over_time)
+            with slot.lock:
+                pt = slot.load(chunk, geo)
+                df: pd.DataFrame = _safe_call(pt.interest_over_time)
 
             if df is not None and not df.empty:
-                if "isPartial" in df.columns:
-                    df = df.drop(columns=["isPartial"])
-                for kw in chunk:
-                    if kw in df.columns:
-                        scores[kw] = round(float(df[kw].mean()), 2)
-                    else:
-                        scores[kw] = 0.0
-            else:
-                for kw in chunk:
-                    scores[kw] = 0.0
+                # 整張表一次取平均，只取本批關鍵字（isPartial 欄位不會被讀到）
+                means = df.mean(numeric_only=True).round(2)
+                return {kw: float(means.get(kw, 0.0)) for kw in chunk}, slot
 
         except Exception as exc:
             logger.warning("  批次 %s 失敗，略過：%s", chunk, exc)
-            for kw in chunk:
-                scores[kw] = 0.0
+        return dict.fromkeys(chunk, 0.0), None
 
-        # 批次之間稍作停頓
-        if idx < len(chunks) - 1:
-            time.sleep(3)
+    # 各批次並行送出，節流交給 pytrends_bucket（不再固定 sleep）
+    scores: dict[str, float] = {}
+    batch_slots: list[Optional[_PytrendsSlot]] = []   # 各批次載入 payload 的 slot
+    for batch_scores, slot in _map_batches(run_batch, chunks):
+        scores.update(batch_scores)
+        batch_slots.append(slot)
 
     # 排序並取 top_n
     sorted_kws = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_n]
     result = [{"keyword": kw, "avg_score": score} for kw, score in sorted_kws]
     logger.info("  [%s] Top %d 高聲量關鍵字：%s", scenario, top_n, result)
-    return result
+
+    # top 關鍵字恰為同一批次的全部關鍵字 → 該 slot 的 payload 可供 related_queries 沿用
+    top_set = {kw for kw, _ in sorted_kws}
+    reusable = None
+    for chunk, slot in zip(chunks, batch_slots):
+        if slot is not None and set(chunk) == top_set:
+            reusable = slot
+    return result, reusable
 
 
 # ─────────────────────────────────────────────────────────────
@@ -340,62 +453,105 @@ def expand_related_keywords(
     top_keywords: list[dict],
     geo: str = "TW",
     max_per_kw: int = 10,
+    preloaded: Optional[_PytrendsSlot] = None,
 ) -> list[dict]:
     """
     對每個高聲量關鍵字呼叫 related_queries，取 top + rising 各最多 max_per_kw 筆，
-    去重後回傳。
+    去重後回傳。preloaded 為 Step 1 已載入 top 關鍵字的 slot 時直接沿用其 payload。
 
     Returns:
         [{"keyword": "便宜機票", "source": "機票", "type": "top", "value": 100}, ...]
     """
-    pt = _get_pytrends()
-    seen: set[str] = set()
-    related: list[dict] = []
-
     kw_list = [item["keyword"] for item in top_keywords]
 
     # related_queries 每次最多 5 個關鍵字，這裡已假設 top_n ≤ 5
     # 若 top_n > 5，分批處理
     chunks = [kw_list[i: i + CHUNK_SIZE] for i in range(0, len(kw_list), CHUNK_SIZE)]
 
-    for idx, chunk in enumerate(chunks):
+    def run_batch(idx: int, chunk: list[str]) -> dict:
         logger.info("  [related] 批次 %d/%d，關鍵字：%s", idx + 1, len(chunks), chunk)
+        slot = _get_pytrends()
         try:
-            pt.build_payload(kw_list=chunk, timeframe=DISCOVERY_TIMEFRAME, geo=geo)
-            result: dict = _safe_call(pt.related_queries)
-
-            for kw in chunk:
-                kw_data = result.get(kw, {}) if result else {}
-
-                for qtype in ("top", "rising"):
-                    df = kw_data.get(qtype)
-                    if df is None or df.empty:
-                        continue
-                    df = df.head(max_per_kw)
-                    for _, row in df.iterrows():
-                        q = str(row.get("query", "")).strip()
-                        if q and q not in seen:
-                            seen.add(q)
-                            related.append({
-                                "keyword": q,
-                                "source": kw,
-                                "type": qtype,
-                                "value": int(row.get("value", 0)),
-                            })
-
+            with slot.lock:
+                pt = slot.load(chunk, geo)
+                return _safe_call(pt.related_queries, cost=len(chunk)) or {}
         except Exception as exc:
             logger.warning("  related_queries 批次 %s 失敗：%s", chunk, exc)
+            return {}
+
+    def reuse_preloaded() -> Optional[dict]:
+        # related_queries 會對 payload 內每個關鍵字各送一次請求，
+        # 故只在 payload 恰為 top 關鍵字時沿用（top_n 較小時重建反而較省）；
+        # payload 可能已被其他批次覆寫，持 lock 再確認一次
+        with preloaded.lock:
+            if preloaded.payload is None or preloaded.payload[1] != geo \
+                    or set(kw_list) != set(preloaded.payload[0]):
+                return None
+            logger.info("  [related] 沿用已載入的 payload：%s", list(preloaded.payload[0]))
+            try:
+                return _safe_call(preloaded.pt.related_queries, cost=len(kw_list)) or {}
+            except Exception as exc:
+                logger.warning("  related_queries 批次 %s 失敗：%s", kw_list, exc)
+                return {}
+
+    results = reuse_preloaded() if preloaded is not None and len(chunks) == 1 else None
+    if results is not None:
+        results = [results]
+    else:
+        # 批次並行抓取；map 保持批次順序，去重結果與逐批執行相同
+        results = _map_batches(run_batch, chunks)
+
+    # 各 (關鍵字, top/rising) 的前 max_per_kw 筆依序收集，最後一次合併去重
+    parts: list[pd.DataFrame] = []
+    for chunk, result in zip(chunks, results):
+        for kw in chunk:
+            kw_data = result.get(kw) or {}
+
+            for qtype in ("top", "rising"):
+                df = kw_data.get(qtype)
+                if df is None or df.empty:
+                    continue
+                parts.append(
+                    df.head(max_per_kw)
+                    .reindex(columns=["query", "value"])
+                    .assign(source=kw, type=qtype)
+                )
 
-        if idx < len(chunks) - 1:
-            time.sleep(3)
+    related: list[dict] = []
+    if parts:
+        import pandas as pd
+        all_df = pd.concat(parts, ignore_index=True)
+        all_df["query"] = all_df["query"].astype(str).str.strip()
+        all_df["value"] = all_df["value"].fillna(0).astype(int)
+        all_df = all_df[all_df["query"] != ""].drop_duplicates("query", keep="first")
+        related = (
+            all_df.rename(columns={"query": "keyword"})[["keyword", "source", "type", "value"]]
+            .to_dict(orient="records")
+        )
 
     logger.info("  相關關鍵字共 %d 筆（去重後）", len(related))
     return related
 
 
 # ─────────────────────────────────────────────────────────────
-# 快取存取（Supabase）
+# 快取存取（程序內 L1 → Supabase）
 # ─────────────────────────────────────────────────────────────
+_L1: dict[tuple[str, str], tuple[float, dict]] = {}   # (scenario, geo) → (存入時間, 快照)
+_L1_lock = threading.Lock()
+
+
+def _l1_get(scenario: str, geo: str) -> Optional[dict]:
+    with _L1_lock:
+        entry = _L1.get((scenario, geo))
+    if entry and time.monotonic() - entry[0] < L1_TTL_SECONDS:
+        return entry[1]
+    return None
+
+
+def _l1_set(scenario: str, geo: str, snapshot: dict) -> None:
+    with _L1_lock:
+        _L1[(scenario, geo)] = (time.monotonic(), snapshot)
+
 
 def _load_cache(scenario: str, geo: str) -> Optional[dict]:
     """
@@ -409,12 +565,12 @@ def _load_cache(scenario: str, geo: str) -> Optional[dict]:
 
         resp = (
             sb.table("keyword_snapshots")
-            .select("id, top_keywords, related_kws, created_at")
+            .select("top_keywords, related_kws, created_at")
             .eq("scenario", scenario)
             .eq("geo", geo)
             .gte("created_at", ttl_cutoff)
             .order("created_at", desc=True)
-            .limit(1)
+            .range(0, 0)
             .execute()
         )
 
@@ -424,6 +580,7 @@ def _load_cache(scenario: str, geo: str) -> Optional[dict]:
                 "快取命中：場景=%s, geo=%s, 建立於 %s",
                 scenario, geo, row["created_at"],
             )
+            _l1_set(scenario, geo, row)
             return row
         return None
 
@@ -442,25 +599,114 @@ def _save_cache(
     將發現結果寫入 Supabase keyword_snapshots，回傳 created_at 時間字串。
     """
     now_iso = datetime.now(timezone.utc).isoformat()
+    _l1_set(scenario, geo, {
+        "top_keywords": top_keywords,
+        "related_kws": related_kws,
+        "created_at": now_iso,
+    })
     try:
-        sb = _get_supabase()
-        sb.table("keyword_snapshots").insert({
+        from postgrest.types import ReturnMethod
+
+        # top_keywords / related_kws 建立時已是 Python 原生型別（float()、to_dict），
+        # 可直接交給 supabase-py 編碼；return=minimal 不回傳整列
+        _get_supabase().table("keyword_snapshots").insert({
             "scenario": scenario,
             "geo": geo,
             "top_keywords": top_keywords,
             "related_kws": related_kws,
             "created_at": now_iso,
-        }).execute()
+        }, returning=ReturnMethod.minimal).execute()
         logger.info("快取已儲存：場景=%s, geo=%s", scenario, geo)
     except Exception as exc:
         logger.warning("儲存 Supabase 快取失敗（不影響主功能）：%s", exc)
     return now_iso
 
 
+# ─────────────────────────────────────────────────────────────
+# Single-flight：同一組參數同時只有一個呼叫真的去抓 Google Trends
+# ─────────────────────────────────────────────────────────────
+SINGLE_FLIGHT_TIMEOUT_SECONDS = 120
+
+
+class _Flight:
+    """一次進行中的抓取；結果存在物件上，等待者持有參考即可讀取。"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+_inflight: dict[tuple, _Flight] = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key: tuple, fn):
+    """
+    第一個呼叫者執行 fn()，其餘同 key 的並行呼叫者等待並共用其結果（或例外）。
+    等待逾時則自行執行 fn()。
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS):
+            return fn()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    try:
+        flight.value = fn()
+        return flight.value
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        flight.done.set()
+
+
 # ─────────────────────────────────────────────────────────────
 # 主要對外 API
 # ─────────────────────────────────────────────────────────────
 
+def _discover_and_save(scenario: str, geo: str, top_n: int) -> tuple[list, list, str]:
+    logger.info("開始發現場景 [%s]（geo=%s, top_n=%d）…", scenario, geo, top_n)
+
+    # 2. 高聲量關鍵字發現
+    top_keywords_raw, slot = _discover_top_keywords(scenario, geo, top_n)
+
+    # 3. 相關關鍵字擴展（top 關鍵字恰在同一批次時沿用 Step 1 的 payload）
+    related_kws_raw = expand_related_keywords(top_keywords_raw, geo=geo, preloaded=slot)
+
+    # 4. 寫入 Supabase 快取（不含 services，讓 map 更新可立即反映）
+    cached_at = _save_cache(scenario, geo, top_keywords_raw, related_kws_raw)
+    return top_keywords_raw, related_kws_raw, cached_at
+
+
+def _attach_services(
+    top_keywords: list[dict],
+    related_kws: list[dict],
+    scenario: str,
+) -> tuple[list[dict], list[dict]]:
+    """為 top / related 關鍵字附上 services；兩邊重複出現的關鍵字只查一次。"""
+    svc_map = {
+        kw: get_keyword_services(kw, scenario)
+        for kw in {x["keyword"] for x in itertools.chain(top_keywords, related_kws)}
+    }
+    return (
+        [{**kw, "services": svc_map[kw["keyword"]]} for kw in top_keywords],
+        [{**kw, "services": svc_map[kw["keyword"]]} for kw in related_kws],
+    )
+
+
 def run_discovery(
     scenario: str,
     geo: str = "TW",
@@ -488,22 +734,17 @@ def run_discovery(
     """
     if scenario not in SCENARIO_SEEDS:
         raise ValueError(
-            f"未知場景：'{scenario}'，可用場景：{list(SCENARIO_SEEDS.keys())}"
+            f"未知場景：'{scenario}'，可用場景：{list(_SCENARIO_LIST)}"
         )
 
     # 1. 嘗試快取
     if not force_refresh:
-        cached = _load_cache(scenario, geo)
+        cached = _l1_get(scenario, geo) or _load_cache(scenario, geo)
         if cached:
             # 快取命中時即時補充 services（不存在快取中，確保 map 更新立即生效）
-            top_kws = [
-                {**kw, "services": get_keyword_services(kw["keyword"], scenario)}
-                for kw in cached["top_keywords"]
-            ]
-            rel_kws = [
-                {**kw, "services": get_keyword_services(kw["keyword"], scenario)}
-                for kw in cached["related_kws"]
-            ]
+            top_kws, rel_kws = _attach_services(
+                cached["top_keywords"], cached["related_kws"], scenario
+            )
             return {
                 "scenario": scenario,
                 "geo": geo,
@@ -513,28 +754,13 @@ def run_discovery(
                 "from_cache": True,
             }
 
-    logger.info("開始發現場景 [%s]（geo=%s, top_n=%d）…", scenario, geo, top_n)
-
-    # 2. 高聲量關鍵字發現
-    top_keywords_raw = discover_top_keywords(scenario, geo=geo, top_n=top_n)
-
-    time.sleep(3)   # 避免連續呼叫觸發限速
-
-    # 3. 相關關鍵字擴展
-    related_kws_raw = expand_related_keywords(top_keywords_raw, geo=geo)
-
-    # 4. 寫入 Supabase 快取（不含 services，讓 map 更新可立即反映）
-    cached_at = _save_cache(scenario, geo, top_keywords_raw, related_kws_raw)
+    # 2–4. 快取未命中：並行的相同請求只抓一次
+    top_keywords_raw, related_kws_raw, cached_at = _single_flight(
+        (scenario, geo, top_n), lambda: _discover_and_save(scenario, geo, top_n)
+    )
 
     # 5. 即時注入 services 欄位
-    top_keywords = [
-        {**kw, "services": get_keyword_services(kw["keyword"], scenario)}
-        for kw in top_keywords_raw
-    ]
-    related_kws = [
-        {**kw, "services": get_keyword_services(kw["keyword"], scenario)}
-        for kw in related_kws_raw
-    ]
+    top_keywords, related_kws = _attach_services(top_keywords_raw, related_kws_raw, scenario)
 
     return {
         "scenario": scenario,
@@ -548,14 +774,13 @@ def run_discovery(
 
 def list_scenarios() -> list[str]:
     """回傳所有可用場景名稱。"""
-    return list(SCENARIO_SEEDS.keys())
+    return list(_SCENARIO_LIST)
 
 
 # ─────────────────────────────────────────────────────────────
 # CLI 快速測試
 # ─────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    import json
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(message)s",
@@ -564,6 +789,13 @@ if __name__ == "__main__":
     import sys
     scenario_arg = sys.argv[1] if len(sys.argv) > 1 else "旅遊"
     force_arg = "--force" in sys.argv
+    json_arg = "--json" in sys.argv
+
+    if json_arg:
+        # 輸出完整結果（orjson 原生支援 datetime / tuple）
+        r = run_discovery(scenario_arg, geo="TW", top_n=5, force_refresh=force_arg)
+        print(orjson.dumps(r, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
+        sys.exit(0)
 
     print(f"\n{'='*55}")
     print(f"  Keyword Discovery — 場景：{scenario_arg}")
@@ -10,13 +10,20 @@ news_service.py
 
 from __future__ import annotations
 
+import io
 import logging
 import os
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from datetime import datetime, timezone
 
+import ahocorasick
 import requests
+from cachetools import TTLCache
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
@@ -33,18 +40,42 @@ RSS_FEEDS = {
 }
 
 CACHE_TTL = 7200   # 2 小時
-_cache: dict[str, dict] = {}
+CACHE_MAXSIZE = 1024
+
+# 共用連線池（gnews.io / ltn.com.tw keep-alive），429 / 5xx 由 urllib3 退避重試；
+# 讀取逾時不重試（read=False），否則每次 10–15s 的逾時會被放大成約 4 倍
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=3,
+        read=False,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+))
+_SESSION.headers.update({"User-Agent": "TrendsExplorer/1.0"})
+
+# 多關鍵字批次擷取時的同時連線數上限
+NEWS_FETCH_WORKERS = 10
+_news_executor = ThreadPoolExecutor(max_workers=NEWS_FETCH_WORKERS, thread_name_prefix="news")
+
+# 有上限的 TTL 快取：超過 CACHE_MAXSIZE 筆時淘汰最久未用者
+_cache: TTLCache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+_cache_lock = threading.RLock()
 
 
 def _cache_get(key: str):
-    entry = _cache.get(key)
-    if entry and time.time() < entry["expires_at"]:
-        return entry["data"]
-    return None
+    with _cache_lock:
+        return _cache.get(key)
 
 
 def _cache_set(key: str, data):
-    _cache[key] = {"data": data, "expires_at": time.time() + CACHE_TTL}
+    with _cache_lock:
+        _cache[key] = data
 
 
 # ─────────────────────────────────────────────────────────────
@@ -63,7 +94,7 @@ def _fetch_gnews(keyword: str, lang: str = "zh-Hant", max_results: int = 5) -> l
             "max": max_results,
             "apikey": GNEWS_API_KEY,
         }
-        resp = requests.get(GNEWS_BASE, params=params, timeout=15)
+        resp = _SESSION.get(GNEWS_BASE, params=params, timeout=15)
         if resp.status_code == 200:
             data = resp.json()
             articles = data.get("articles", [])
@@ -89,43 +120,77 @@ def _fetch_gnews(keyword: str, lang: str = "zh-Hant", max_results: int = 5) -> l
 # ─────────────────────────────────────────────────────────────
 
 def _fetch_rss(keyword: str, scenario: str = "", max_results: int = 5) -> list[dict]:
-    """從 RSS feed 爬取並過濾含關鍵字的新聞。"""
-    import xml.etree.ElementTree as ET
+    """從 RSS feed 爬取並過濾含關鍵字的新聞（串流解析，湊滿 max_results 即停）。"""
+    return _fetch_rss_multi([keyword], scenario=scenario, max_per_kw=max_results)[keyword]
+
+
+def _fetch_rss_multi(
+    keywords: list[str],
+    scenario: str = "",
+    max_per_kw: int = 5,
+) -> dict[str, list[dict]]:
+    """
+    抓一次 RSS feed，同時為多個關鍵字過濾新聞。
+    以 Aho-Corasick 一次掃描每則 item 的標題 + 摘要，找出其中出現的所有關鍵字；
+    全部關鍵字都湊滿 max_per_kw 筆即停止解析。
+    """
+    buckets: dict[str, list[dict]] = {kw: [] for kw in keywords}
+    automaton = ahocorasick.Automaton()
+    for kw in buckets:
+        if kw:
+            automaton.add_word(kw, kw)
+    if not len(automaton):
+        return buckets
+    automaton.make_automaton()
+    pending = len(automaton)   # 尚未湊滿的關鍵字數
 
     feed_url = RSS_FEEDS.get(scenario, RSS_FEEDS["_default"])
     try:
-        resp = requests.get(feed_url, timeout=10, headers={"User-Agent": "TrendsExplorer/1.0"})
+        resp = _SESSION.get(feed_url, timeout=10)
         if resp.status_code != 200:
-            return []
-        root = ET.fromstring(resp.content)
-        items = root.findall(".//item")
-        results = []
-        for item in items:
+            return buckets
+        items = etree.iterparse(
+            io.BytesIO(resp.content), tag="item",
+            resolve_entities=False, no_network=True,
+        )
+        for _, item in items:
             title = item.findtext("title", "")
             desc  = item.findtext("description", "")
-            url   = item.findtext("link", "")
-            pub   = item.findtext("pubDate", "")
-            # 簡單關鍵字過濾
-            if keyword in title or keyword in desc:
-                results.append({
+            # \x00 分隔，避免比對到跨越標題與摘要的字串
+            matched = {kw for _, kw in automaton.iter(title + "\x00" + desc)}
+            if matched:
+                entry = {
                     "title":       title,
                     "description": desc[:200] if desc else "",
-                    "url":         url,
+                    "url":         item.findtext("link", ""),
                     "source":      "自由時報",
-                    "published_at": pub,
-                })
-            if len(results) >= max_results:
+                    "published_at": item.findtext("pubDate", ""),
+                }
+                for kw in matched:
+                    bucket = buckets[kw]
+                    if len(bucket) < max_per_kw:
+                        bucket.append(entry)
+                        if len(bucket) == max_per_kw:
+                            pending -= 1
+            # 已處理的 item 立即釋放
+            item.clear()
+            while item.getprevious() is not None:
+                del item.getparent()[0]
+            if pending == 0:
                 break
-        return results
     except Exception as exc:
         logger.error("RSS fetch failed: %s", exc)
-    return []
+    return buckets
 
 
 # ─────────────────────────────────────────────────────────────
 # 公開介面
 # ─────────────────────────────────────────────────────────────
 
+def _news_cache_key(keyword: str, scenario: str, max_results: int) -> str:
+    return f"news:{keyword}:{scenario}:{max_results}"
+
+
 def fetch_keyword_news(
     keyword: str,
     scenario: str = "",
@@ -141,7 +206,7 @@ def fetch_keyword_news(
     Returns:
         [{title, description, url, source, published_at}, ...]
     """
-    cache_key = f"news:{keyword}:{scenario}:{max_results}"
+    cache_key = _news_cache_key(keyword, scenario, max_results)
     cached = _cache_get(cache_key)
     if cached is not None:
         return cached
@@ -156,3 +221,45 @@ def fetch_keyword_news(
     # fallback: 提供空列表（前端顯示「暫無新聞」）
     _cache_set(cache_key, news)
     return news
+
+
+def fetch_keyword_news_many(
+    keywords: list[str],
+    scenario: str = "",
+    lang: str = "zh-Hant",
+    max_results: int = 5,
+) -> dict[str, list[dict]]:
+    """
+    擷取多個關鍵字的新聞；快取與 fallback 規則同 fetch_keyword_news。
+    GNews 並行呼叫（最多 NEWS_FETCH_WORKERS 個同時進行），
+    GNews 無結果的關鍵字合併為一次 RSS 抓取。
+
+    Returns:
+        {keyword: [{title, description, url, source, published_at}, ...], ...}
+        依傳入順序，重複的關鍵字只擷取一次
+    """
+    unique = list(dict.fromkeys(keywords))
+    results: dict[str, list[dict]] = {}
+    misses: list[str] = []
+    for kw in unique:
+        cached = _cache_get(_news_cache_key(kw, scenario, max_results))
+        if cached is not None:
+            results[kw] = cached
+        else:
+            misses.append(kw)
+
+    # 優先 GNews
+    if misses and GNEWS_API_KEY:
+        gnews = _news_executor.map(
+            lambda kw: _fetch_gnews(kw, lang=lang, max_results=max_results), misses
+        )
+        results.update(zip(misses, gnews))
+
+    # fallback: RSS（同一 feed 只抓一次）
+    no_news = [kw for kw in misses if not results.get(kw)]
+    if no_news:
+        results.update(_fetch_rss_multi(no_news, scenario=scenario, max_per_kw=max_results))
+
+    for kw in misses:
+        _cache_set(_news_cache_key(kw, scenario, max_results), results[kw])
+    return {kw: results[kw] for kw in unique}
@@ -0,0 +1,107 @@
+"""
+rate_limiter.py
+===============
+Google Trends 對外請求的自適應 token bucket（Adaptive Token Bucket）
+
+app.py 與 keyword_discovery.py 的所有 pytrends 呼叫都先經過同一個
+pytrends_bucket.acquire()，避免本服務自己製造 429 風暴：
+  - 取不到 token（超過 timeout）時拋出 RateLimited，呼叫端直接回 429
+  - 觀察到 Google 429 → decrease_rate()（乘法遞減 β）
+  - 呼叫成功        → increase_rate()（加法遞增 δ，上限為初始速率）
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """本地 token bucket 在 timeout 內取不到 token（請求未送出）。"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"本地限速中，約 {retry_after:.0f}s 後再試")
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """取出 429 回應的 Retry-After 秒數；無標頭或為 HTTP 日期格式時回傳 None。"""
+    if isinstance(exc, RateLimited):
+        return exc.retry_after
+    response = getattr(exc, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    執行緒安全的 token bucket，產生速率會依 429 回饋自動調整（AIMD）。
+
+    Args:
+        rate:     每秒產生的 token 數（亦為速率上限）
+        capacity: bucket 容量（允許的瞬間突發量）
+        min_rate: 速率下限，避免連續 429 後完全停擺
+        beta:     遇到 429 時速率乘上的係數
+        delta:    每次成功時速率增加的量
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        min_rate: float = 0.05,
+        beta: float = 0.5,
+        delta: float = 0.05,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.beta = beta
+        self.delta = delta
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float = 30.0, tokens: int = 1) -> None:
+        """
+        取得 tokens 個 token（一次呼叫會送出多個 Google 請求時依請求數扣除，
+        最多扣到 capacity）；等待超過 timeout 秒則拋出 RateLimited。
+        """
+        tokens = min(tokens, self.capacity)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise RateLimited(wait)
+            time.sleep(wait)
+
+    def decrease_rate(self) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.beta)
+        logger.warning("pytrends token bucket 降速至 %.3f/s", self.rate)
+
+    def increase_rate(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.delta)
+
+
+# 全程序共用：平均每 2 秒一次，最多突發 5 次
+pytrends_bucket = TokenBucket(rate=0.5, capacity=5)